@@ -1,23 +1,206 @@
 import os
+import re
 import json
 import base64
 import time
 import mimetypes
-from flask import Flask, render_template, send_file, request, send_from_directory
+import functools
+from flask import Flask, render_template, send_file, request, send_from_directory, make_response
 from modules.capture_controller import CaptureController
 from modules.event_listener import EventListener
 from modules.reconstructor import Reconstructor
 
+# optional: incremental JSON parser, avoids loading whole capture files
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# optional: production WSGI server, hands files to wsgi.file_wrapper
+try:
+    from waitress import serve
+except ImportError:
+    serve = None
+
 app = Flask(
     __name__,
     template_folder="templates",
     static_folder="static"
 )
 
+# Let a fronting web server (nginx/Apache with X-Sendfile) send pcap and
+# reconstructed files itself; only enable when running behind one
+app.config["USE_X_SENDFILE"] = os.environ.get("WEBREPLAY_X_SENDFILE") == "1"
+
 # Global controller + listener
 controller = CaptureController()
 listener = EventListener(controller)
 
+# Resolves captured URLs to reconstructed file paths for the listing page
+url_reconstructor = Reconstructor("dummy.json", outputdir=os.path.join("data", "reconstructed"))
+
+
+@functools.lru_cache(maxsize=65536)
+def local_path_for(url, mime_type):
+    """
+    Memoised Reconstructor.create_local_path; the result only depends on
+    the URL and MIME type for a fixed output directory.
+    """
+    return url_reconstructor.create_local_path(url, mime_type)
+
+
+def iter_flows(f):
+    """
+    Yield flows one at a time from an open (binary) capture JSON file.
+    Uses ijson when installed so the full flow list is never held in memory.
+    """
+    if ijson is not None:
+        yield from ijson.items(f, "item")
+    else:
+        yield from json.load(f)
+
+
+def latest_file(directory, suffixes):
+    """
+    Name of the greatest (newest, names carry a timestamp) file in directory
+    ending with one of suffixes, or None. One scandir pass, no sorting.
+    """
+    latest = None
+    with os.scandir(directory) as it:
+        for entry in it:
+            name = entry.name
+            if name.endswith(suffixes) and (latest is None or name > latest):
+                latest = name
+    return latest
+
+
+# Newest capture JSON, reused while the directory mtime is unchanged:
+# (dir_mtime, latest_path)
+_latest_capture = (None, None)
+
+# Last parsed file per loader, reused while its mtime/size are unchanged:
+# loader -> (path, file_key, value)
+_parsed_files = {}
+
+
+def latest_capture(output_dir):
+    """
+    Path of the newest capture JSON in output_dir, or None if there is none.
+    Only re-lists the directory when its mtime changes.
+    """
+    global _latest_capture
+
+    dir_mtime = os.stat(output_dir).st_mtime_ns
+    if _latest_capture[0] != dir_mtime:
+        latest = latest_file(output_dir, (".json",))
+        _latest_capture = (dir_mtime, latest and os.path.join(output_dir, latest))
+    return _latest_capture[1]
+
+
+def cached_load(path, loader):
+    """
+    loader(path), reused until the file's mtime or size changes.
+    """
+    st = os.stat(path)
+    file_key = (st.st_mtime_ns, st.st_size)
+
+    cached = _parsed_files.get(loader)
+    if cached and cached[0] == path and cached[1] == file_key:
+        return cached[2]
+
+    value = loader(path)
+    _parsed_files[loader] = (path, file_key, value)
+    return value
+
+
+def summarise_capture(path):
+    """
+    (mime_by_url, reconstructible_urls) for a capture JSON, streamed.
+    """
+    with open(path, "rb") as f:
+        return Reconstructor.summarise_urls(iter_flows(f))
+
+
+def load_manifest(path):
+    """
+    URL listing saved by Reconstructor.create_manifest.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def listing_source(output_dir):
+    """
+    (source_path, is_manifest) the newest capture's URL listing comes from,
+    or None if there is no capture yet. Only stats files, so it is cheap
+    enough to run before deciding whether the listing is needed at all.
+    """
+    latest_path = latest_capture(output_dir)
+    if latest_path is None:
+        return None
+
+    manifest = url_reconstructor.manifest_path(latest_path)
+    if manifest.is_file():
+        return manifest, True
+    return latest_path, False
+
+
+def url_listing(source_path, is_manifest):
+    """
+    URL listing from a listing_source() result. Uses the manifest written
+    after reconstruction when there is one, and only falls back to scanning
+    the capture while it is still reconstructing.
+    """
+    if is_manifest:
+        return cached_load(source_path, load_manifest)
+
+    mime_by_url, reconstructible_urls = cached_load(source_path, summarise_capture)
+    return url_reconstructor.build_url_listing(mime_by_url, reconstructible_urls, local_path_for)
+
+
+# Exclude ad and tracking domains
+AD_DOMAINS = [
+    'doubleclick', 'googlesyndication', 'googleadservices',
+    'ads.', 'adservice', 'safeframe', 'bbloader', 'trustedframe',
+    'advertising', 'googletagmanager', 'googletagservices'
+]
+
+# Exclude API endpoints
+API_KEYWORDS = [
+    '/api/', '/suggest', '/autocomplete', '/complete/search',
+    '/xhr/', '/ajax/', '/graphql', '/rpc/', '/webapi/',
+    'clients6.youtube.com'  # YouTube suggestion API
+]
+
+# Exclude tracking and analytics
+TRACKING_KEYWORDS = [
+    '/tracking/', '/analytics/', '/beacon/', '/pixel/',
+    '/logstreamz', '/jserror', '/cspreport', '/gen_204'
+]
+
+# Exclude embedded iframes and widgets
+IFRAME_KEYWORDS = [
+    '/iframe/', '/embed/', '/widget/', '/frame/',
+    'syncframe', 'hovercard'
+]
+
+# All of the above as one case-insensitive pattern, so each URL is scanned once
+NON_WEBPAGE_RE = re.compile(
+    "|".join(map(re.escape, AD_DOMAINS + API_KEYWORDS + TRACKING_KEYWORDS + IFRAME_KEYWORDS)),
+    re.IGNORECASE
+)
+
+
+def is_real_webpage(url, mime_type):
+    """
+    Filter out non-webpage HTML content like ads, APIs, and iframes.
+    Returns True only for actual user-facing web pages.
+    """
+    if 'html' not in mime_type.lower():
+        return False
+
+    return NON_WEBPAGE_RE.search(url) is None
+
 
 # HOME PAGE
 @app.route("/")
@@ -42,106 +225,40 @@ def urls_page():
     if not os.path.isdir(output_dir):
         return render_template("urls.html", urls=None)
 
-    json_files = sorted(
-        [f for f in os.listdir(output_dir) if f.endswith(".json")],
-        reverse=True
-    )
-
-    if not json_files:
+    source = listing_source(output_dir)
+    if source is None:
         return render_template("urls.html", urls=None)
 
-    latest = json_files[0]
-    with open(os.path.join(output_dir, latest), "r", encoding="utf-8") as f:
-        flows = json.load(f)
+    source_path, is_manifest = source
 
-    # Identify reconstructible URLs (those with a response body)
-    reconstructible_urls = set()
-    for flow in flows:
-        if flow.get("url") and flow.get("resp_body_b64"):
-            reconstructible_urls.add(flow["url"])
+    # A finished capture's manifest never changes, so the browser's copy can
+    # be validated without building the listing. While reconstruction is still
+    # writing files the listing changes underneath the capture, so no validator.
+    etag = None
+    if is_manifest:
+        st = os.stat(source_path)
+        etag = f"{os.path.basename(source_path)}-{st.st_mtime_ns:x}-{st.st_size:x}"
+        if etag in request.if_none_match:
+            response = make_response("", 304)
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
 
-    all_urls = set(flow.get("url") for flow in flows if "url" in flow)
-    
-    # Sort: Reconstructible first (False < True), then alphabetical
-    sorted_urls = sorted(all_urls, key=lambda u: (u not in reconstructible_urls, u))
+    listing = url_listing(source_path, is_manifest)
 
-    # Calculate reconstructed paths and check file existence
-    reconstructor = Reconstructor("dummy.json", outputdir=os.path.join("data", "reconstructed"))
-    
     reconstructed_urls = []
     non_reconstructed_urls = []
-    
-    def is_real_webpage(url, mime_type):
-        """
-        Filter out non-webpage HTML content like ads, APIs, and iframes.
-        Returns True only for actual user-facing web pages.
-        """
-        if 'html' not in mime_type.lower():
-            return False
-        
-        url_lower = url.lower()
-        
-        # Exclude ad and tracking domains
-        ad_domains = [
-            'doubleclick', 'googlesyndication', 'googleadservices',
-            'ads.', 'adservice', 'safeframe', 'bbloader', 'trustedframe',
-            'advertising', 'googletagmanager', 'googletagservices'
-        ]
-        if any(domain in url_lower for domain in ad_domains):
-            return False
-        
-        # Exclude API endpoints
-        api_keywords = [
-            '/api/', '/suggest', '/autocomplete', '/complete/search',
-            '/xhr/', '/ajax/', '/graphql', '/rpc/', '/webapi/',
-            'clients6.youtube.com'  # YouTube suggestion API
-        ]
-        if any(keyword in url_lower for keyword in api_keywords):
-            return False
-        
-        # Exclude tracking and analytics
-        tracking_keywords = [
-            '/tracking/', '/analytics/', '/beacon/', '/pixel/',
-            '/logstreamz', '/jserror', '/cspreport', '/gen_204'
-        ]
-        if any(keyword in url_lower for keyword in tracking_keywords):
-            return False
-        
-        # Exclude embedded iframes and widgets
-        iframe_keywords = [
-            '/iframe/', '/embed/', '/widget/', '/frame/',
-            'syncframe', 'hovercard'
-        ]
-        if any(keyword in url_lower for keyword in iframe_keywords):
-            return False
-        
-        return True
-    
-    for u in sorted_urls:
-        flow = next((f for f in flows if f.get("url") == u), None)
-        mime_type = flow.get("mime_type", "") if flow else ""
-        
-        # Calculate local path
-        local_path = reconstructor.create_local_path(u, mime_type)
-        
-        # Check if file actually exists
-        file_exists = local_path.exists() if local_path else False
-        
-        try:
-            rel_path = local_path.relative_to(reconstructor.outputdir)
-            link = f"/reconstructed/{rel_path}".replace("\\", "/")
-        except ValueError:
-            link = "#"
 
+    for entry in listing:
         url_item = {
-            "original": u,
-            "link": link,
-            "mime_type": mime_type
+            "original": entry["original"],
+            "link": f"/reconstructed/{entry['path']}" if entry["path"] else "#",
+            "mime_type": entry["mime_type"]
         }
-        
-        if file_exists:
+
+        if entry["reconstructed"]:
             # Only show real web pages, not ads/APIs/iframes
-            if is_real_webpage(u, mime_type):
+            if is_real_webpage(entry["original"], entry["mime_type"]):
                 reconstructed_urls.append(url_item)
         else:
             non_reconstructed_urls.append(url_item)
@@ -153,14 +270,20 @@ def urls_page():
     end_idx = start_idx + per_page
     paginated_non_reconstructed = non_reconstructed_urls[start_idx:end_idx]
 
-    return render_template(
+    response = make_response(render_template(
         "urls.html",
         reconstructed_urls=reconstructed_urls,
         non_reconstructed_urls=paginated_non_reconstructed,
         current_page=page,
         total_pages=total_pages,
         total_non_reconstructed=total_non_reconstructed
-    )
+    ))
+
+    # Browsers revalidate every time, getting a 304 until the manifest changes
+    if etag:
+        response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 # SERVE RECONSTRUCTED FILES
@@ -185,18 +308,12 @@ def serve_reconstructed(filename):
 def download_pcap():
     output_dir = os.path.join("data", "output", "pcap")
 
-    pcap_files = sorted(
-        [
-            f for f in os.listdir(output_dir)
-            if f.endswith(".pcap") or f.endswith(".pcapng")
-        ],
-        reverse=True
-    )
+    latest = latest_file(output_dir, (".pcap", ".pcapng"))
 
-    if not pcap_files:
+    if latest is None:
         return "No PCAP files found."
 
-    latest = os.path.join(output_dir, pcap_files[0])
+    latest = os.path.join(output_dir, latest)
     return send_file(latest, as_attachment=True)
 
 
@@ -208,10 +325,14 @@ if __name__ == "__main__":
     print("[+] Starting EventListener...")
     listener.start()
 
-    # Critical: disable reloader (otherwise app runs twice)
-    app.run(
-        host="127.0.0.1",
-        port=5000,
-        debug=False,
-        use_reloader=False
-    )
+    if serve is not None:
+        # waitress streams send_file() responses via wsgi.file_wrapper
+        serve(app, host="127.0.0.1", port=5000)
+    else:
+        # Critical: disable reloader (otherwise app runs twice)
+        app.run(
+            host="127.0.0.1",
+            port=5000,
+            debug=False,
+            use_reloader=False
+        )
@@ -1,10 +1,11 @@
 import subprocess
 import threading
-import json
 import time
 from collections import deque
 import os
 import signal
+import socket
+import selectors
 import glob
 import shutil
 import sys
@@ -22,13 +23,19 @@ class CaptureController:
         os.makedirs(self.output_web, exist_ok=True)
         os.makedirs(self.output_pcap, exist_ok=True)
 
-        # HTTP FLOW BUFFER
+        # HTTP FLOW BUFFER: (receive time, raw JSON frame) per flow; flows are
+        # only decoded when a window is extracted
         self.buffer = deque(maxlen=buffer_minutes * 2000)
-        self.new_flows = deque()
 
-        # MITM logging
+        # MITM logging (flows arrive over a local socket, see mitm_addon.py)
         self.mitm_proc = None
         self.reader_thread = None
+        self.flow_server = None
+
+        # socket pair used to wake the reader thread on stop (selectable on
+        # Windows too, unlike os.pipe)
+        self._wake_r = None
+        self._wake_w = None
 
         # Rotating PCAP temp directory (internal storage)
         self.pcap_dir = os.path.join(os.getcwd(), "data", "pcap_rotating")
@@ -68,15 +75,18 @@ class CaptureController:
 
         print("[+] Launching mitmdump...")
 
+        # Loopback socket the addon streams length-prefixed flows into
+        # (plain TCP so it works the same on Windows)
+        self.flow_server = socket.create_server(("127.0.0.1", 0))
+        host, port = self.flow_server.getsockname()
+        self._wake_r, self._wake_w = socket.socketpair()
+
         try:
-            # Critical: force unbuffered output
             self.mitm_proc = subprocess.Popen(
                 cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,      # merge output
-                text=True,
-                bufsize=1,                     # line-buffer
-                env={**os.environ, "PYTHONUNBUFFERED": "1"}
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                env={**os.environ, "WEBREPLAY_PIPE": f"{host}:{port}"}
             )
         except FileNotFoundError:
             print("[ERROR] mitmdump not found in PATH!")
@@ -108,24 +118,81 @@ class CaptureController:
 
         self.mitm_proc = None
 
-    # MITMDUMP stdout reader
+        # wake the reader out of select() and let it finish
+        if self._wake_w:
+            self._wake_w.send(b"\0")
+        if self.reader_thread:
+            self.reader_thread.join(timeout=5)
+            self.reader_thread = None
+
+        for sock in (self.flow_server, self._wake_r, self._wake_w):
+            if sock:
+                sock.close()
+        self.flow_server = self._wake_r = self._wake_w = None
+
+    # MITMDUMP flow reader: each frame is a 4-byte little-endian length + JSON
     def _reader_loop(self):
         print("[+] mitmdump reader started.")
-        for line in self.mitm_proc.stdout:
-            line = line.strip()
-            if not line:
-                continue
+        server, wake = self.flow_server, self._wake_r
 
-            try:
-                obj = json.loads(line)
-                obj["timestamp"] = time.time()
-                self.buffer.append(obj)
-                self.new_flows.append(obj)
-            except json.JSONDecodeError:
-                # mitmdump logs or errors — ignore non-JSON lines
-                continue
+        sel = selectors.DefaultSelector()
+        sel.register(server, selectors.EVENT_READ)
+        sel.register(wake, selectors.EVENT_READ)
 
-        print("[!] mitmdump reader stopped.")
+        try:
+            while True:
+                for key, _ in sel.select():
+                    if key.fileobj is wake:
+                        # stop_mitmdump asked us to finish
+                        return
+
+                    if key.fileobj is server:
+                        # (re)connect from the addon, e.g. after a restart;
+                        # an old connection is read until it closes.
+                        # Non-blocking with a per-connection buffer, so a
+                        # stalled half-sent frame can't keep us from select()
+                        conn, _ = server.accept()
+                        conn.setblocking(False)
+                        sel.register(conn, selectors.EVENT_READ, bytearray())
+                        continue
+
+                    conn, pending = key.fileobj, key.data
+                    try:
+                        data = conn.recv(1 << 20)
+                    except BlockingIOError:
+                        continue
+                    except OSError:
+                        data = b""
+                    if not data:
+                        sel.unregister(conn)
+                        conn.close()
+                        continue
+
+                    pending += data
+                    now = time.time()
+                    for frame in self._take_frames(pending):
+                        self.buffer.append((now, frame))
+        finally:
+            for key in list(sel.get_map().values()):
+                if key.fileobj not in (server, wake):
+                    key.fileobj.close()
+            sel.close()
+            print("[!] mitmdump reader stopped.")
+
+    # Pop every complete length-prefixed frame off the front of a buffer
+    @staticmethod
+    def _take_frames(pending):
+        frames = []
+        offset = 0
+        while len(pending) - offset >= 4:
+            size = int.from_bytes(pending[offset:offset + 4], "little")
+            end = offset + 4 + size
+            if len(pending) < end:
+                break
+            frames.append(bytes(pending[offset + 4:end]))
+            offset = end
+        del pending[:offset]
+        return frames
 
     # Start dumpcap rotating capture
     def start_dumpcap(self, iface="Ethernet"):
@@ -172,18 +239,47 @@ class CaptureController:
 
         with open(out_file, "wb") as outfile:
             for p in last_10:
-                with open(p, "rb") as f:
-                    shutil.copyfileobj(f, outfile)
+                self._append_file(p, outfile)
+
+    # Append a file's bytes to an open output file, in-kernel where possible
+    def _append_file(self, path, outfile):
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            offset = 0
+
+            # os.sendfile only exists on POSIX, and macOS can only send to sockets
+            if hasattr(os, "sendfile"):
+                outfile.flush()
+                try:
+                    while offset < size:
+                        sent = os.sendfile(outfile.fileno(), f.fileno(), offset, size - offset)
+                        if sent == 0:
+                            break
+                        offset += sent
+                    return
+                except OSError:
+                    pass
+
+            f.seek(offset)
+            shutil.copyfileobj(f, outfile, 1024 * 1024)
 
     # Extract HTTP window
     def extract_http_window(self, window_minutes, out_file):
         cutoff = time.time() - (window_minutes * 60)
-        flows = [x for x in self.buffer if x["timestamp"] >= cutoff]
 
-        print(f"[+] Writing {len(flows)} HTTP flows → {out_file}")
+        # snapshot first: the reader thread keeps appending while we write
+        frames = [frame for received, frame in list(self.buffer) if received >= cutoff]
+
+        print(f"[+] Writing {len(frames)} HTTP flows → {out_file}")
 
-        with open(out_file, "w") as f:
-            json.dump(flows, f, indent=2)
+        # frames are already JSON objects, write them out as one array
+        with open(out_file, "wb") as f:
+            f.write(b"[")
+            for i, frame in enumerate(frames):
+                if i:
+                    f.write(b",\n")
+                f.write(frame)
+            f.write(b"]")
 
     # On ALERT → extract past + future windows
     def handle_alert(self, event):
@@ -233,6 +329,7 @@ class CaptureController:
                 if r.load_data():
                     r.reconstruct()
                     r.create_index_page()
+                    r.create_manifest()
                     print(f"[+] Reconstruction complete for {json_path}")
             except Exception as e:
                 print(f"[ERROR] Auto-reconstruction failed: {e}")
@@ -1,8 +1,16 @@
 import win32evtlog
+import win32event
 import threading
-import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
 from typing import Callable, Optional, Dict, Any
 
+# namespace of events rendered with EvtRenderEventXml
+EVENT_NS = {"e": "http://schemas.microsoft.com/win/2004/08/events/event"}
+
+# XML <Level> -> classic EVENTLOG_*_TYPE (1 = ERROR, 2 = WARNING, 4 = INFORMATION)
+LEVEL_TO_EVENT_TYPE = {1: 1, 2: 1, 3: 2, 4: 4}
+
 
 class EventListener:
     def __init__(self, controller, log_name: str = "Application"):
@@ -12,58 +20,109 @@ class EventListener:
         self.running = False
         self.thread = None
 
+        # manual-reset event used to wake the listener thread on stop()
+        self.stop_event = win32event.CreateEvent(None, True, False, None)
+
         # Symantec defaults
         self.event_id = 1090453555
         self.source = "Symantec AntiVirus"
-        self.poll_interval = 1
+
+        # fallback re-check if a change notification is ever missed (ms)
+        self.wait_timeout = 60000
 
     def start(self):
         if self.thread and self.thread.is_alive():
             print("[!] EventListener already running.")
             return
 
+        win32event.ResetEvent(self.stop_event)
         self.thread = threading.Thread(target=self._listen_loop, daemon=True)
         self.thread.start()
 
     def stop(self):
         self.running = False
+        win32event.SetEvent(self.stop_event)
+
+    def _close(self):
         if self.handle:
-            win32evtlog.CloseEventLog(self.handle)
+            # subscription handles are closed when released
             self.handle = None
             print("[+] Event listener stopped.")
 
+    def _query(self) -> str:
+        # the rendered <EventID> only holds the low 16 bits of the classic
+        # event ID; the qualifiers (high 16 bits) are checked in _listen_loop
+        return (
+            f"*[System[Provider[@Name='{self.source}'] "
+            f"and (EventID={self.event_id & 0xFFFF})]]"
+        )
+
     def _listen_loop(self):
         try:
-            self.handle = win32evtlog.OpenEventLog(None, self.log_name)
-            flags = win32evtlog.EVENTLOG_FORWARDS_READ | win32evtlog.EVENTLOG_SEQUENTIAL_READ
+            # manual-reset event signalled by Windows when matching events arrive
+            signal_event = win32event.CreateEvent(None, True, False, None)
 
-            # Skip old events
-            while win32evtlog.ReadEventLog(self.handle, flags, 0):
-                pass
+            # filtering happens in the event log service, so only
+            # Symantec alerts are ever handed to Python
+            self.handle = win32evtlog.EvtSubscribe(
+                self.log_name,
+                win32evtlog.EvtSubscribeToFutureEvents,
+                SignalEvent=signal_event,
+                Query=self._query()
+            )
 
             print(f"[+] Listening on Windows Event Log '{self.log_name}'...")
             self.running = True
 
             while self.running:
-                events = win32evtlog.ReadEventLog(self.handle, flags, 0)
-                if events:
+                # sleep in the kernel until new records arrive or stop() is called
+                result = win32event.WaitForMultipleObjects(
+                    [signal_event, self.stop_event], False, self.wait_timeout
+                )
+                if result == win32event.WAIT_OBJECT_0 + 1:
+                    break
+
+                # reset before draining so events arriving meanwhile re-signal
+                win32event.ResetEvent(signal_event)
+
+                while True:
+                    events = win32evtlog.EvtNext(self.handle, 16, 0)
+                    if not events:
+                        break
                     for event in events:
-                        if event.EventID == self.event_id and event.SourceName == self.source:
-                            data = self._parse_event(event)
-                            print("\n[!] SYMANTEC ALERT DETECTED!")
-                            print(f"    Time:   {data['time_generated']}")
-                            print(f"    Source: {data['source']}")
-                            self.controller.handle_alert(data)
-                time.sleep(self.poll_interval)
+                        data = self._parse_event(event)
+                        if data['event_id'] != self.event_id:
+                            continue
+                        print("\n[!] SYMANTEC ALERT DETECTED!")
+                        print(f"    Time:   {data['time_generated']}")
+                        print(f"    Source: {data['source']}")
+                        self.controller.handle_alert(data)
 
         finally:
-            self.stop()
+            self.running = False
+            self._close()
 
     def _parse_event(self, event) -> Dict[str, Any]:
+        root = ET.fromstring(
+            win32evtlog.EvtRender(event, win32evtlog.EvtRenderEventXml)
+        )
+        system = root.find("e:System", EVENT_NS)
+
+        event_id_el = system.find("e:EventID", EVENT_NS)
+        qualifiers = int(event_id_el.get("Qualifiers") or 0)
+        level = int(system.findtext("e:Level", "4", EVENT_NS))
+
+        # SystemTime is UTC ISO 8601 with 7 fractional digits
+        system_time = system.find("e:TimeCreated", EVENT_NS).get("SystemTime")
+        time_generated = datetime.strptime(system_time[:19], "%Y-%m-%dT%H:%M:%S")
+        time_generated = time_generated.replace(tzinfo=timezone.utc).astimezone()
+
+        strings = [d.text or "" for d in root.iterfind("e:EventData/e:Data", EVENT_NS)]
+
         return {
-            'event_id': event.EventID,
-            'event_type_raw': event.EventType,
-            'source': event.SourceName,
-            'time_generated': event.TimeGenerated.Format(),
-            'strings': event.StringInserts
+            'event_id': (qualifiers << 16) | int(event_id_el.text),
+            'event_type_raw': LEVEL_TO_EVENT_TYPE.get(level, 4),
+            'source': system.find("e:Provider", EVENT_NS).get("Name"),
+            'time_generated': time_generated.strftime("%c"),
+            'strings': strings or None
         }
@@ -1,11 +1,72 @@
 from mitmproxy import http
 import json
 import base64
+import os
+import socket
+import sys
 import time
 
+# optional: faster JSON encoding
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Bodies over this size are only kept for page content (HTML/JS/CSS/JSON/text);
+# large images, video and downloads are dropped to keep the capture buffer small
+MAX_BODY = 2 * 1024 * 1024
+PAGE_MIME_KEYWORDS = ("html", "javascript", "css", "json", "text/")
+
+
+def keep_body(raw: bytes, mime_type: str) -> bool:
+    if len(raw) <= MAX_BODY:
+        return True
+    mime_type = mime_type.lower()
+    return any(keyword in mime_type for keyword in PAGE_MIME_KEYWORDS)
+
+
+# CaptureController passes "host:port" of its flow socket; without it
+# (e.g. running mitmdump by hand) flows are printed as JSON lines instead
+PIPE_ADDRESS = os.environ.get("WEBREPLAY_PIPE")
+_pipe = None
+
+
+def emit(entry: dict):
+    global _pipe
+
+    try:
+        data = orjson.dumps(entry) if orjson else json.dumps(entry).encode()
+    except TypeError:
+        # orjson rejects lone surrogates, which get_text(strict=False)
+        # produces for request bodies that aren't valid UTF-8
+        data = json.dumps(entry).encode()
+
+    if PIPE_ADDRESS:
+        if _pipe is None:
+            host, port = PIPE_ADDRESS.rsplit(":", 1)
+            _pipe = socket.create_connection((host, int(port)))
+        # length-prefixed frame, no newline scanning on the reader side
+        try:
+            _pipe.sendall(len(data).to_bytes(4, "little") + data)
+        except OSError:
+            # reconnect on the next flow
+            _pipe.close()
+            _pipe = None
+            raise
+        return
+
+    # write bytes directly, skipping the str round-trip through print()
+    sys.stdout.flush()
+    sys.stdout.buffer.write(data + b"\n")
+    sys.stdout.buffer.flush()
+
+
 class SimpleJsonLogger:
     def response(self, flow: http.HTTPFlow):
         try:
+            mime_type = flow.response.headers.get("Content-Type", "")
+            raw = flow.response.raw_content or b""
+
             entry = {
                 "timestamp": time.time(),
                 "client": str(flow.client_conn.address),
@@ -17,16 +78,14 @@ class SimpleJsonLogger:
 
                 "status_code": flow.response.status_code,
                 "resp_headers": dict(flow.response.headers),
-                "mime_type": flow.response.headers.get("Content-Type", ""),
-                "resp_body_b64": base64.b64encode(
-                    flow.response.raw_content or b""
-                ).decode()
+                "mime_type": mime_type,
+                "resp_body_b64": base64.b64encode(raw).decode() if keep_body(raw, mime_type) else ""
             }
 
-            print(json.dumps(entry), flush=True)
+            emit(entry)
 
         except Exception as e:
-            print(json.dumps({"error": str(e)}), flush=True)
+            emit({"error": str(e)})
 
 
 addons = [
@@ -5,9 +5,16 @@ takes in .json web content as input and tries to reconstruct web pages from data
 """
 
 # native libraries
-import json, base64, gzip, os, re, hashlib, argparse
+import json, base64, os, re, hashlib, argparse
+import html as html_lib
+import codecs
 import brotli
 import zlib
+import itertools
+from collections import Counter
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from io import BytesIO
 from urllib.parse import urlparse, unquote
 from pathlib import Path
@@ -20,10 +27,251 @@ except ImportError:
     print("bs4 not installed: try pip install beautifulsoup4")
     BeautifulSoup = None
 
+# optional: libxml2-backed HTML parsing, much faster than bs4's html.parser
+try:
+    from lxml import html as lxml_html
+    # no default doctype for pages captured without one
+    _LXML_PARSER = lxml_html.HTMLParser(default_doctype=False)
+except ImportError:
+    lxml_html = None
+    _LXML_PARSER = None
+
+# optional: much faster parsing of large capture files
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# characters invalid in windows filenames, and control characters
+_INVALID_WIN_CHARS = re.compile(r'[<>:"|?*\\\/]')
+_CTRL_CHARS = re.compile(r'[\x00-\x1f]')
+
+# characters base64.b64decode discards (line breaks, spaces, ...)
+_NON_B64_CHARS = re.compile(r'[^A-Za-z0-9+/=]')
+
+# tags whose links are rewritten to reconstructed files, and the attribute holding the link
+_LINK_ATTRS = {
+    'link': 'href',
+    'script': 'src',
+    'img': 'src',
+    'a': 'href',
+    'iframe': 'src',
+}
+
+# fast path for link rewriting: walks the markup tag by tag, skipping comments and
+# the contents of raw-text elements so only real tag attributes are touched
+# attribute text of a tag: a quote only opens a value right after '=', so quotes
+# inside unquoted values (class=x'y) don't swallow the rest of the page.
+# Possessive, so a tag with no closing '>' (truncated page) fails in linear
+# time instead of retrying every way of splitting its quoted values
+_ATTR_TEXT = r'''(?:[^>"'=]|=\s*"[^"]*"|=\s*'[^']*'|[="'])*+'''
+_QUOTED_VALUE_RE = re.compile(r'''=\s*(?:"[^"]*"|'[^']*')''')
+_FAST_TAG_RE = re.compile(
+    r'''<!--.*?(?:-->|$)'''
+    r'''|<(?P<raw>script|style|textarea|title)(?=[\s/>])(?P<rawattrs>''' + _ATTR_TEXT + r''')>(?:.*?</(?P=raw)\s*>|.*)'''
+    r'''|<(?P<tag>[a-zA-Z][^\s/>]*)(?P<attrs>''' + _ATTR_TEXT + r''')>''',
+    re.I | re.S
+)
+_ATTR_TOKEN_RE = re.compile(r'''([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+)))?''')
+
+# MIME type substring -> file extension, first match wins
+_MIME_EXT = (
+    ('html', '.html'),
+    ('javascript', '.js'),
+    ('css', '.css'),
+    ('json', '.json'),
+    ('image/gif', '.gif'),
+    ('image/png', '.png'),
+    ('image/jpeg', '.jpg'),
+    ('image/jpg', '.jpg'),
+)
+
+@functools.lru_cache(maxsize=256)
+def _ext_for(mime_type: str) -> str:
+    """
+    file extension for a MIME type; captures only hold a handful of distinct
+    types, so each is matched against the table once
+    """
+    return next((ext for key, ext in _MIME_EXT if key in mime_type), '')
+
+# byte order marks, checked before any declared charset
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+_HEADER_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+_META_CHARSET_RE = re.compile(rb'''<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)''', re.I)
+
+def _sniff_charset(body: bytes, content_type: str) -> str:
+    """
+    work out the charset of an HTML body: BOM, then the Content-Type header,
+    then a <meta> declaration near the top of the page; utf-8 otherwise
+
+    args:
+    body(bytes) - decoded (decompressed) response body
+    content_type(str) - Content-Type / mime_type of the response
+
+    returns:
+    charset(str) - text codec name usable with bytes.decode
+    """
+    for bom, charset in _BOMS:
+        if body.startswith(bom):
+            return charset
+
+    match = _HEADER_CHARSET_RE.search(content_type)
+    if not match:
+        match = _META_CHARSET_RE.search(body, 0, 4096)
+        # a page can't declare itself utf-16 from inside ascii-compatible markup
+        if match and match.group(1).lower().startswith(b'utf-16'):
+            match = None
+    if not match:
+        return 'utf-8'
+
+    charset = match.group(1)
+    if isinstance(charset, bytes):
+        charset = charset.decode('ascii')
+    try:
+        codec = codecs.lookup(charset)
+    except LookupError:
+        return 'utf-8'
+    # bytes-to-bytes codecs (hex, base64, rot13) aren't text encodings
+    if not getattr(codec, '_is_text_encoding', True):
+        return 'utf-8'
+    return codec.name
+
+# charset declarations in decoded markup: <meta charset=...> and http-equiv content="...; charset=..."
+_META_CHARSET_DECL_RE = re.compile(r'''(<meta\b[^>]*?charset\s*=\s*["']?\s*)[\w.:-]+''', re.I)
+_HEAD_OPEN_RE = re.compile(r'<head\b[^>]*>', re.I)
+_DOCTYPE_RE = re.compile(r'\s*<!doctype[^>]*>', re.I)
+
+def _declare_utf8(html: str) -> str:
+    """
+    make a page transcoded to utf-8 say so: rewrite its charset declarations,
+    or add <meta charset="utf-8"> when it had none (charset came from the
+    HTTP header only)
+
+    args:
+    html(str) - decoded HTML page
+
+    returns:
+    html(str) - page declaring utf-8
+    """
+    html, count = _META_CHARSET_DECL_RE.subn(r'\g<1>utf-8', html)
+    if count:
+        return html
+
+    meta = '<meta charset="utf-8">'
+    anchor = _HEAD_OPEN_RE.search(html) or _DOCTYPE_RE.match(html)
+    if anchor:
+        return html[:anchor.end()] + meta + html[anchor.end():]
+    return meta + html
+
+def _status_code(value) -> int:
+    """
+    status code as an int, so range checks never compare strings; 0 if missing
+    """
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+def _parse_url(url: str):
+    """
+    urlparse() for the parsed-URL column; None for empty or malformed URLs
+    """
+    if not url:
+        return None
+    try:
+        return urlparse(url)
+    except ValueError:
+        return None
+
+def _iter_files(directory, prefix: str = '', exclude=()):
+    """
+    yield the '/'-separated relative path of every file below directory;
+    scandir entries carry their type, so no extra stat per file like os.walk
+
+    args:
+    directory(str/Path) - directory to walk
+    prefix(str) - prepended to every yielded path
+    exclude(set) - entry names skipped at the top level only
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name in exclude:
+                continue
+            rel_path = prefix + entry.name
+            if entry.is_dir():
+                # like os.walk, don't descend into symlinked directories
+                if not entry.is_symlink():
+                    yield from _iter_files(entry.path, rel_path + '/')
+            else:
+                yield rel_path
+
+def _write_file(path: Path, data: bytes):
+    """
+    write a body that is already in memory straight to the file descriptor,
+    without a buffered file object in between
+
+    args:
+    path(Path) - file to create or overwrite
+    data(bytes) - full file contents
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def _short_hash(text: str, length: int) -> str:
+    """
+    short hex discriminator for file names (not security relevant);
+    BLAKE2b sized to the digest needed, cheaper than MD5 for short inputs
+    """
+    return hashlib.blake2b(text.encode(), digest_size=(length + 1) // 2).hexdigest()[:length]
+
+@functools.lru_cache(maxsize=8192)
+def _sanitise_filename(filename: str, max_length: int) -> str:
+    """
+    pure, memoised implementation of Reconstructor.sanitise_filename;
+    the same path components repeat across many URLs of a domain
+    """
+    # remove/replace invalid characters for windows
+    filename = _INVALID_WIN_CHARS.sub('_', filename)
+    filename = _CTRL_CHARS.sub('', filename)
+
+    # truncate filename
+    if len(filename) > max_length:
+        # keep extension
+        parts = filename.split('.', 1)
+        if len(parts) == 2 and len(parts[1]) <= 10:
+            # has extension
+            base = parts[0][:max_length - len(parts[1]) - 5] # leave room for hash
+            hash_suffix = _short_hash(filename, 4)
+            filename = f"{base}_{hash_suffix}.{parts[1]}"
+        else:
+            # no extension or very long one
+            hash_suffix = _short_hash(filename, 4)
+            filename = f"{filename[:max_length-5]}_{hash_suffix}"
+
+    return filename
+
 class Reconstructor:
     """
     process .json HTTP data and reconstruct web pages
     """
+    # subdirectory of outputdir holding per-capture URL manifests
+    MANIFEST_DIR = 'manifests'
+
+    # base64 characters decoded per step when streaming bodies (multiple of 4)
+    B64_CHUNK = 64 * 1024
+
+    # zlib wbits for gzip-wrapped streams
+    GZIP_WBITS = 16 + zlib.MAX_WBITS
+
     def __init__(self, jsonfile: str, outputdir: str="reconstructed_sites"):
         """
         initialise class
@@ -37,6 +285,16 @@ class Reconstructor:
         self.outputdir.mkdir(exist_ok=True)
         self.data = []
         self.resources_map = {}
+
+        # directories already created by create_local_path
+        self._known_dirs = set()
+
+        # per-field columns of self.data, built once by load_data
+        self._urls = []
+        self._parsed = []
+        self._statuses = []
+        self._mimes = []
+        self._methods = []
         self.cached_pages = []
 
     def load_data(self) -> bool:
@@ -50,17 +308,39 @@ class Reconstructor:
         bool - True or False depending on .json loading was successful
         """
         try:
-            with open(self.jsonfile, 'r', encoding='utf-8') as f:
-                self.data = json.load(f)
+            with open(self.jsonfile, 'rb') as f:
+                raw = f.read()
+
+            try:
+                self.data = orjson.loads(raw) if orjson else json.loads(raw)
+            except ValueError:
+                if not orjson:
+                    raise
+                # orjson rejects some input json accepts (e.g. lone surrogates)
+                self.data = json.loads(raw)
+            self._build_columns()
             print(f"Loaded {len(self.data)} HTTP transactions")
             return True
         except Exception as e:
             print(f"Error loading .json file: {e}")
             return False
         
+    def _build_columns(self):
+        """
+        project the fields every pass reads into parallel lists, so the
+        passes loop over plain lists instead of probing each flow dict
+        """
+        self._urls = [i.get('url', '') for i in self.data]
+        self._parsed = [_parse_url(url) for url in self._urls]
+        self._statuses = [_status_code(i.get('status_code')) for i in self.data]
+        self._mimes = [i.get('mime_type', '') for i in self.data]
+        self._methods = [i.get('method', 'unknown') for i in self.data]
+
     def decode_body(self, entry: Dict) -> Optional[bytes]:
         """
         decode HTTP body from base 64, gunzip if needed
+        base 64 is decoded in chunks and fed straight into the decompressor,
+        so the compressed body is never held in memory as a whole
 
         args:
         entry(dict) - .json dictionary containing HTTP data
@@ -73,38 +353,106 @@ class Reconstructor:
             return None
         
         try:
-            body_bytes = base64.b64decode(b64body)
-
-            # Check for content encoding header
-            headers = entry.get('resp_headers', {})
-            # Normalize headers to lowercase keys
-            headers = {k.lower(): v for k, v in headers.items()}
-            encoding = headers.get('content-encoding', '').lower()
+            # chunking needs every 4 characters to be one base 64 group; drop
+            # what b64decode would skip anyway, e.g. line breaks in wrapped input
+            if _NON_B64_CHARS.search(b64body):
+                b64body = _NON_B64_CHARS.sub('', b64body)
+
+            # Check for content encoding header; keys keep the server's casing,
+            # so scan for the one header instead of lowercasing them all
+            encoding = ''
+            for k, v in (entry.get('resp_headers') or {}).items():
+                if k.lower() == 'content-encoding':
+                    encoding = v.lower()
+                    break
+
+            chunks = self._b64_chunks(b64body)
+            first = next(chunks, b'')
+            chunks = itertools.chain((first,), chunks)
 
             if 'br' in encoding:
                 try:
-                    body_bytes = brotli.decompress(body_bytes)
+                    return self._brotli_stream(chunks)
                 except brotli.error as e:
                     print(f"Brotli decompression failed for {entry.get('url')}: {e}")
-            elif 'gzip' in encoding or (len(body_bytes) >= 2 and body_bytes[:2] == b'\x1f\x8b'):
+            elif 'gzip' in encoding or first[:2] == b'\x1f\x8b':
                 try:
-                    body_bytes = gzip.decompress(body_bytes)
-                except gzip.BadGzipFile:
+                    return self._zlib_stream(chunks, self.GZIP_WBITS)
+                except zlib.error:
                     pass
             elif 'deflate' in encoding:
                 try:
-                    body_bytes = zlib.decompress(body_bytes)
+                    return self._zlib_stream(chunks, zlib.MAX_WBITS)
                 except zlib.error:
                     # Try raw deflate (no zlib header)
                     try:
-                        body_bytes = zlib.decompress(body_bytes, -15)
+                        return self._zlib_stream(self._b64_chunks(b64body), -zlib.MAX_WBITS)
                     except zlib.error:
                         pass
+            else:
+                return b''.join(chunks)
 
-            return body_bytes
+            # decompression failed, keep the body as captured
+            return base64.b64decode(b64body)
         except Exception as e:
             print(f"Error decoding HTTP body for {entry.get('url', 'unknown')}: {e}")
             return None
+
+    def _b64_chunks(self, b64body: str):
+        """
+        decode base 64 in B64_CHUNK sized pieces
+
+        args:
+        b64body(str) - base 64 encoded body
+
+        returns:
+        generator of decoded byte chunks
+        """
+        for start in range(0, len(b64body), self.B64_CHUNK):
+            yield base64.b64decode(b64body[start:start + self.B64_CHUNK])
+
+    def _brotli_stream(self, chunks) -> bytes:
+        """
+        brotli-decompress a stream of chunks
+
+        args:
+        chunks(iterable) - compressed byte chunks
+
+        returns:
+        decompressed body in bytes; raises brotli.error if invalid or truncated
+        """
+        decompressor = brotli.Decompressor()
+        parts = [decompressor.process(chunk) for chunk in chunks]
+        if not decompressor.is_finished():
+            raise brotli.error('truncated brotli stream')
+        return b''.join(parts)
+
+    def _zlib_stream(self, chunks, wbits: int) -> bytes:
+        """
+        zlib/gzip/raw-deflate decompress a stream of chunks
+
+        args:
+        chunks(iterable) - compressed byte chunks
+        wbits(int) - zlib wbits selecting the container format
+
+        returns:
+        decompressed body in bytes; raises zlib.error if invalid or truncated
+        """
+        parts = []
+        decompressor = zlib.decompressobj(wbits)
+        for chunk in chunks:
+            while chunk:
+                if decompressor.eof:
+                    # gzip allows several members back to back, and zero padding
+                    if wbits != self.GZIP_WBITS or not chunk.strip(b'\x00'):
+                        break
+                    decompressor = zlib.decompressobj(wbits)
+                parts.append(decompressor.decompress(chunk))
+                chunk = decompressor.unused_data if decompressor.eof else b''
+
+        if not decompressor.eof:
+            raise zlib.error('incomplete or truncated stream')
+        return b''.join(parts)
         
     def sanitise_filename(self, filename:str, max_length: int=100) -> str:
         """
@@ -118,42 +466,38 @@ class Reconstructor:
         returns:
         filename(str) - filename, sanitised for windows systems
         """
-        # remove/replace invalid characters for windows
-        filename = re.sub(r'[<>:"|?*\\\/]', '_', filename)
-        filename = re.sub(r'[\x00-\x1f]', '', filename)
-
-        # truncate filename
-        if len(filename) > max_length:
-            # keep extension
-            parts = filename.split('.', 1)
-            if len(parts) == 2 and len(parts[1]) <= 10:
-                # has extension
-                base = parts[0][:max_length - len(parts[1]) - 5] # leave room for hash
-                hash_suffix = hashlib.md5(filename.encode()).hexdigest()[:4]
-                filename = f"{base}_{hash_suffix}.{parts[1]}"
-            else:
-                # no extension or very long one
-                hash_suffix = hashlib.md5(filename.encode()).hexdigest()[:4]
-                filename = f"{filename[:max_length-5]}_{hash_suffix}"
-
-        return filename
+        return _sanitise_filename(filename, max_length)
         
-    def create_local_path(self, url:str, mime_type:str='') -> Path:
+    def _ensure_dir(self, path: Path):
+        """
+        create a directory the first time it is needed; repeat calls for
+        the same directory are a set lookup instead of a mkdir syscall
+
+        args:
+        path(Path) - directory to create
+        """
+        if path not in self._known_dirs:
+            path.mkdir(parents=True, exist_ok=True)
+            self._known_dirs.add(path)
+
+    def create_local_path(self, url:str, mime_type:str='', parsed=None) -> Path:
         """
         create local file path for given URL
 
         args:
         url(str) - input URL
         mime_type(str) - MIME type, helps determine file extension
+        parsed(ParseResult) - optional urlparse() of url, parsed here if not given
 
         returns:
         Path object for local file path
         """
-        parsed = urlparse(url)
+        if parsed is None:
+            parsed = urlparse(url)
 
         # create dir for domain
         domain_dir = self.outputdir / self.sanitise_filename(parsed.netloc.replace(':','_'))
-        domain_dir.mkdir(exist_ok=True)
+        self._ensure_dir(domain_dir)
 
         # parse path & query separately
         path = parsed.path.strip('/')
@@ -176,26 +520,11 @@ class Reconstructor:
                 # if there's query parameters, create hash-based filename
                 if parsed.query:
                     # create hash of full URL
-                    url_hash = hashlib.md5(url.encode()).hexdigest()[:8]
+                    url_hash = _short_hash(url, 8)
 
                     # determine mime type extension
-                    ext =''
-                    if 'html' in mime_type:
-                        path+='.html'
-                    elif 'javascript' in mime_type:
-                        path+='.js'
-                    elif 'css' in mime_type:
-                        path+= '.css'
-                    elif 'json' in mime_type:
-                        path+= '.json'
-                    elif 'image/gif' in mime_type:
-                        path += '.gif'
-                    elif 'image/png' in mime_type:
-                        path+='.png'
-                    elif 'image/jpg' in mime_type:
-                        path+='.jpg'
-
-                    else:
+                    ext = _ext_for(mime_type)
+                    if not ext:
                         # use query parameters to make unique filename
                         if '.' in filename:
                             ext = '.' + filename.rsplit('.', 1)[1][:4] # limit extension
@@ -210,12 +539,7 @@ class Reconstructor:
                 else:
                     # if there's no query parameters, then just ensure extension is there
                     if '.' not in filename:
-                        if 'html' in mime_type:
-                            path_parts[-1] = filename + '.html'
-                        elif 'javascript' in mime_type:
-                            path_parts[-1] = filename + '.js'
-                        elif 'json' in mime_type:
-                            path_parts[-1] = filename + '.json'
+                        path_parts[-1] = filename + _ext_for(mime_type)
             
             # reconstruct path
             if len(path_parts) > 1:
@@ -224,7 +548,7 @@ class Reconstructor:
                 for i in path_parts[:-1]:
                     subdir = subdir / i
                     try:
-                        subdir.mkdir(exist_ok=True)
+                        self._ensure_dir(subdir)
                     except OSError as e:
                         # if cannot create directory, flatten directory structure
                         print(f"Error: Cannot create deep directory, flattening: {e}")
@@ -241,7 +565,7 @@ class Reconstructor:
         # check 1 more time to ensure full path isn't too long
         if len(str(local_path)) > 250:
             # Use hash if path is too long
-            url_hash = hashlib.md5(url.encode()).hexdigest()[:12]
+            url_hash = _short_hash(url, 12)
             ext = '.html'
             if 'javascript' in mime_type:
                 ext = '.js'
@@ -260,9 +584,128 @@ class Reconstructor:
 
         return local_path
     
+    def _link_resolver(self, baseurl: str):
+        """
+        build the link mapping for one page; everything derived from the
+        base URL is worked out once, and repeated links are looked up once
+
+        args:
+        baseurl(str) - base URL for resolving relative links
+
+        returns:
+        resolve(function) - maps a link as written in the page to its
+        replacement; None if the resource was not captured
+        """
+        parsed_base = urlparse(baseurl)
+        scheme = parsed_base.scheme
+        scheme_host = f"{scheme}://{parsed_base.netloc}"
+        basepath = baseurl.rsplit('/', 1)[0]
+        # links are made relative to where the page itself is saved
+        pagepath = self.resources_map.get(baseurl)
+        rel_start = pagepath.parent if pagepath is not None else self.outputdir
+        resources_map = self.resources_map
+        resolved = {}
+
+        def resolve(originalurl: Optional[str]) -> Optional[str]:
+            if not originalurl:
+                return None
+            if originalurl in resolved:
+                return resolved[originalurl]
+
+            # skip data URL and anchor
+            if originalurl.startswith(('data:', '#', 'javascript:', 'mailto:')):
+                return None
+
+            # convert to absolute URL
+            if originalurl[0] == '/':
+                if originalurl[:2] == '//':
+                    # protocol-relative, inherits the page's scheme
+                    absurl = f"{scheme}:{originalurl}"
+                else:
+                    absurl = scheme_host + originalurl
+            elif not originalurl.startswith(('http://', 'https://')):
+                # use relative URL
+                absurl = f"{basepath}/{originalurl}"
+            else:
+                absurl = originalurl
+
+            # check if resource exists locally
+            localpath = resources_map.get(absurl)
+            if localpath is None:
+                newurl = None
+            else:
+                # update to local path
+                try:
+                    newurl = os.path.relpath(localpath, rel_start).replace('\\', '/')
+                except ValueError:
+                    # can't create relative path
+                    newurl = str(localpath).replace('\\', '/')
+
+            resolved[originalurl] = newurl
+            return newurl
+
+        return resolve
+
+    def _proc_html_fast(self, html: str, resolve) -> str:
+        """
+        rewrite quoted links in place with a single regex pass, leaving the
+        rest of the markup byte for byte as captured
+
+        args:
+        html(str) - original HTML code
+        resolve(function) - link mapping from _link_resolver
+
+        returns:
+        html(str) - HTML content with updated links; raises ValueError on
+        markup that needs a real parser (unquoted or repeated link attributes,
+        or stray quotes in a link tag)
+        """
+        def rewrite(m):
+            if m.group('tag'):
+                tagname, group = m.group('tag').lower(), 'attrs'
+            elif m.group('raw') and m.group('raw').lower() == 'script':
+                tagname, group = 'script', 'rawattrs'
+            else:
+                return m.group(0)
+
+            attrname = _LINK_ATTRS.get(tagname)
+            if not attrname:
+                return m.group(0)
+
+            # stray quotes make attribute boundaries ambiguous
+            attrs = m.group(group)
+            if ('"' in attrs or "'" in attrs) and re.search(r'''["']''', _QUOTED_VALUE_RE.sub('', attrs)):
+                raise ValueError(f"<{tagname}> attributes need the HTML parser")
+
+            found = None
+            for attr in _ATTR_TOKEN_RE.finditer(attrs):
+                if attr.group(1).lower() != attrname:
+                    continue
+                if found is not None or attr.group(4) is not None:
+                    raise ValueError(f"<{tagname}> link needs the HTML parser")
+                found = attr
+
+            valuegroup = 2 if found is not None and found.group(2) is not None else 3
+            if found is None or found.group(valuegroup) is None:
+                return m.group(0)
+
+            newurl = resolve(html_lib.unescape(found.group(valuegroup)))
+            if newurl is None:
+                return m.group(0)
+
+            # splice the new value into the tag, keeping the original quoting
+            offset = m.start(group) - m.start(0)
+            start, end = offset + found.start(valuegroup), offset + found.end(valuegroup)
+            tag = m.group(0)
+            return tag[:start] + html_lib.escape(newurl, quote=True) + tag[end:]
+
+        return _FAST_TAG_RE.sub(rewrite, html)
+
     def proc_html_content(self, html: str, baseurl: str) -> str:
         """
         process HTML content to get/update resource links
+        quoted links are rewritten by a regex pass; other markup goes through
+        lxml when installed, bs4 otherwise (or when lxml rejects the markup)
 
         args:
         html(str) - original HTML code
@@ -271,52 +714,41 @@ class Reconstructor:
         returns:
         soup(str) - HTML content with updated links
         """
+        resolve = self._link_resolver(baseurl)
+
+        try:
+            return self._proc_html_fast(html, resolve)
+        except ValueError:
+            pass
+
+        if lxml_html:
+            try:
+                doc = lxml_html.document_fromstring(html, parser=_LXML_PARSER)
+
+                # one walk over the tree for every tag we rewrite
+                for i in doc.iter(*_LINK_ATTRS):
+                    attrname = _LINK_ATTRS[i.tag]
+                    newurl = resolve(i.get(attrname))
+                    if newurl is not None:
+                        i.set(attrname, newurl)
+
+                # serialise the whole tree so the doctype is kept
+                return lxml_html.tostring(doc.getroottree(), encoding='unicode')
+            except Exception:
+                pass
+
         if not BeautifulSoup:
             return html
-        
+
         try:
             soup = BeautifulSoup(html, 'html.parser')
-            parsed_base = urlparse(baseurl)
 
             # update links for various tags
-            tag_attr_pairs = [
-                ('link', 'href'),
-                ('script', 'src'),
-                ('img', 'src'),
-                ('a', 'href'),
-                ('iframe', 'src'),
-            ]
-
-            for tagname, attrname in tag_attr_pairs:
-                for i in soup.find_all(tagname):
-                    originalurl = i.get(attrname)
-                    if originalurl:
-                        # skip data URL and anchor
-                        if originalurl.startswith(('data:', '#', 'javascript:', 'mailto:')):
-                            continue
-
-                        # convert to absolute URL
-                        if originalurl.startswith('//'):
-                            absurl = f"https://{originalurl}"
-                        elif originalurl.startswith('/'):
-                            absurl = f"{parsed_base.scheme}://{parsed_base.netloc}{originalurl}"
-                        elif not originalurl.startswith(('http://', 'https://')):
-                            # use relative URL
-                            basepath = '/'.join(baseurl.split('/')[:-1])
-                            absurl = f"{basepath}/{originalurl}"
-                        else:
-                            absurl = originalurl
-
-                        # check if resource exists locally
-                        if absurl in self.resources_map:
-                            # update to local path
-                            localpath = self.resources_map[absurl]
-                            try:
-                                rel_path = os.path.relpath(localpath, Path(baseurl).parent)
-                                i[attrname] = rel_path.replace('\\', '/')
-                            except ValueError:
-                                # can't create relative path
-                                i[attrname] = str(localpath).replace('\\', '/')
+            for i in soup.find_all(list(_LINK_ATTRS)):
+                attrname = _LINK_ATTRS[i.name]
+                newurl = resolve(i.get(attrname))
+                if newurl is not None:
+                    i[attrname] = newurl
 
             return str(soup)
         except Exception as e:
@@ -334,54 +766,41 @@ class Reconstructor:
         returns:
         stats(dict) - stats on what was captured in the .json file
         """
+        # content types; counted raw first, a capture has few distinct values
+        content_types = Counter()
+        for mime, count in Counter(self._mimes).items():
+            mime = mime.lower()
+            if mime:
+                content_types[mime] += count
+
+        # count resources within mime, once per distinct type
+        kinds = Counter()
+        for mime, count in content_types.items():
+            if 'html' in mime:
+                kinds['html_pages'] += count
+            elif 'image' in mime:
+                kinds['images'] += count
+            elif 'javascript' in mime:
+                kinds['scripts'] += count
+            elif 'css' in mime:
+                kinds['stylesheets'] += count
+            elif 'json' in mime:
+                kinds['json'] += count
+
         stats={
             'total_requests':len(self.data),
-            'methods':{},
-            'status_codes':{},
-            'content_types':{},
-            'domains':set(),
-            'html_pages':0,
+            'methods':dict(Counter(self._methods)),
+            'status_codes':dict(Counter(self._statuses)),
+            'content_types':dict(content_types),
+            'domains':list({parsed.netloc for parsed in self._parsed if parsed}),
+            'html_pages':kinds['html_pages'],
             'resources':{
-                'images':0,
-                'scripts':0,
-                'stylesheets':0,
-                'json':0
+                'images':kinds['images'],
+                'scripts':kinds['scripts'],
+                'stylesheets':kinds['stylesheets'],
+                'json':kinds['json']
             }
         }
-
-        for i in self.data:
-            # methods
-            method = i.get('method', 'unknown')
-            stats['methods'][method]=stats['methods'].get(method, 0) + 1
-
-            # status codes
-            status = i.get('status', 'unknown')
-            stats['status_codes'][status]=stats['status_codes'].get(status,0) + 1
-
-            # domains
-            url = i.get('url', '')
-            if url:
-                parsed=urlparse(url)
-                stats['domains'].add(parsed.netloc)
-
-            # content types
-            mime = i.get('mime_type', '').lower()
-            if mime:
-                stats['content_types'][mime] = stats['content_types'].get(mime, 0 ) + 1
-
-                # count resources within mime
-                if 'html' in mime:
-                    stats['html_pages'] += 1
-                elif 'image' in mime:
-                    stats['resources']['images'] += 1
-                elif 'javascript' in mime:
-                    stats['resources']['scripts'] += 1
-                elif 'css' in mime:
-                    stats['resources']['stylesheets'] += 1
-                elif 'json' in mime:
-                    stats['resources']['json'] += 1
-
-        stats['domains'] = list(stats['domains'])
         return stats
     
     def reconstruct(self, filter_domains: Optional[List[str]] = None) -> int:
@@ -395,94 +814,110 @@ class Reconstructor:
         pages(int) - number of pages reconstructed
         """
         pages =0
+        html_jobs = {}
 
-        # pass 1: save all resources, build resource map from capture
+        # membership is tested once per entry
+        filter_set = frozenset(filter_domains) if filter_domains else None
+        resource_jobs = {}
+
+        # single sweep: classify entries and build resource map without decoding bodies
         print("\nSaving captured resources...")
-        for i in self.data:
-            url = i.get('url', '')
+        for idx, url in enumerate(self._urls):
             if not url:
                 continue
 
             # apply domain filter, if there are any
-            if filter_domains:
-                parsed=urlparse(url)
-                if parsed.netloc not in filter_domains:
+            parsed = self._parsed[idx]
+            if filter_set is not None:
+                if parsed is None or parsed.netloc not in filter_set:
                     continue
 
-            # process code 200 responses with content
-            status = i.get('status_code', 0)
-            if status not in range(200, 300):
+            status = self._statuses[idx]
+            mime_type = self._mimes[idx]
+            is_html = 'html' in mime_type.lower()
+
+            # Handle cached pages (304)
+            if is_html and status == 304 and parsed:
+                self.cached_pages.append((url, parsed.netloc))
                 continue
 
-            # decode response body
-            body = self.decode_body(i)
-            if not body:
+            # process code 200 responses with content
+            i = self.data[idx]
+            if not (200 <= status < 300) or not i.get('resp_body_b64'):
                 continue
 
-            # create local path
-            mime_type = i.get('mime_type', '')
             try:
-                localpath = self.create_local_path(url, mime_type)
-
-                # save into resource map
-                self.resources_map[url] = localpath
-
-                # save all non-HTML resources as it is
-                if 'html' not in mime_type.lower():
-
-                        with open(localpath, 'wb') as f:
-                            f.write(body)
-                        print(f"Saved: {localpath.name} ({mime_type})")
+                localpath = self.create_local_path(url, mime_type, parsed)
             except Exception as e:
                 print(f"Error saving {url[:80]}: {e}")
+                continue
 
-        # pass 2: process & save HTML pages with updated links
-        print("\nProcessing HTML pages...")
-        for i in self.data:
-            url=i.get('url', '')
-            mime_type = i.get('mime_type', '').lower()
+            if is_html:
+                # HTML is rewritten once every resource is known
+                self.resources_map[url] = localpath
+                html_jobs.setdefault(localpath, []).append((url, i))
+            else:
+                # later captures of the same file win, as with sequential writes
+                resource_jobs.setdefault(localpath, []).append((url, i, mime_type))
 
-            if not url or 'html' not in mime_type:
-                continue
+        # decode & save all non-HTML resources as they are; decompression and
+        # disk writes release the GIL so they overlap across worker threads
+        print_lock = threading.Lock()
 
-            # apply domain filter if any
-            if filter_domains:
-                parsed=urlparse(url)
-                if parsed.netloc not in filter_domains:
+        def save_resource(localpath: Path, candidates: List[Tuple[str, Dict, str]]) -> bool:
+            for url, entry, mime_type in reversed(candidates):
+                body = self.decode_body(entry)
+                if not body:
                     continue
+                try:
+                    _write_file(localpath, body)
+                    with print_lock:
+                        print(f"Saved: {localpath.name} ({mime_type})")
+                    return True
+                except Exception as e:
+                    with print_lock:
+                        print(f"Error saving {url[:80]}: {e}")
+                    return False
+            return False
 
-            # only process successful status codes
-            status = i.get('status_code', 0)
-            
-            # Handle cached pages (304)
-            if status == 304:
-                parsed = urlparse(url)
-                self.cached_pages.append((url, parsed.netloc))
-                continue
-
-            if status not in range(200, 300):
-                continue
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+            futures = {
+                pool.submit(save_resource, localpath, candidates): (localpath, candidates)
+                for localpath, candidates in resource_jobs.items()
+            }
+            for future in as_completed(futures):
+                localpath, candidates = futures[future]
+                if future.result():
+                    for url, _, _ in candidates:
+                        self.resources_map[url] = localpath
 
-            # decode response body
-            body = self.decode_body(i)
-            if not body:
+        # process & save HTML pages with updated links
+        print("\nProcessing HTML pages...")
+        for localpath, candidates in html_jobs.items():
+            # only the newest capture of a page with a body is decoded;
+            # earlier ones would just be overwritten
+            for url, i in reversed(candidates):
+                # decode response body
+                body = self.decode_body(i)
+                if body:
+                    break
+            else:
                 continue
 
             try:
-                # decode HTML
-                html = body.decode('utf-8', errors='ignore')
+                # decode HTML with the charset the page was served in
+                charset = _sniff_charset(body, i.get('mime_type', ''))
+                html = body.decode(charset, errors='replace')
 
                 # update resource links
-                if BeautifulSoup:
-                    html = self.proc_html_content(html, url)
+                html = self.proc_html_content(html, url)
 
-                # save HTML file
-                localpath = self.resources_map.get(url)
-                if localpath:
-                    with open(localpath, 'w', encoding='utf-8') as f:
-                        f.write(html)
-                    print(f"Reconstructed {localpath}")
-                    pages += 1
+                # save HTML file as utf-8, which is what the web interface serves it as
+                if charset not in ('utf-8', 'utf-8-sig'):
+                    html = _declare_utf8(html)
+                _write_file(localpath, html.encode('utf-8'))
+                print(f"Reconstructed {localpath}")
+                pages += 1
 
             except Exception as e:
                 print(f"Error processing {url[:80]}: {e}")
@@ -523,28 +958,20 @@ class Reconstructor:
         html_count = 0
         resource_count = 0
 
-        for root, dirs, files in os.walk(self.outputdir):
-            for f in files:
-                if f == 'index.html' and root == str(self.outputdir):
-                    continue
-
-                filepath = Path(root)/f
-                rel_path = filepath.relative_to(self.outputdir)
-
-                # get domain from path
-                parts = str(rel_path).split(os.sep)
-                if parts:
-                    domain = parts[0]
+        # manifests are bookkeeping, not reconstructed content
+        for rel_path in _iter_files(self.outputdir, exclude={self.MANIFEST_DIR, 'index.html'}):
+            # get domain from path
+            domain = rel_path.split('/', 1)[0]
 
-                    if domain not in domains:
-                        domains[domain] = []
+            if domain not in domains:
+                domains[domain] = []
 
-                    domains[domain].append(str(rel_path).replace('\\','/'))
+            domains[domain].append(rel_path)
 
-                    if f.endswith('.html'):
-                        html_count += 1
-                    else:
-                        resource_count += 1
+            if rel_path.endswith('.html'):
+                html_count += 1
+            else:
+                resource_count += 1
 
         # Add cached pages to domains
         for url, domain in self.cached_pages:
@@ -553,18 +980,25 @@ class Reconstructor:
             # Add with a special marker to identify it as cached
             domains[domain].append(f"CACHED:{url}")
 
+        # stats go into the header template only; file names may contain braces
+        parts = [index_html.format(
+            total_files=html_count + resource_count,
+            html_count=html_count,
+            resource_count=resource_count
+        )]
+
         # add domains to index
         for domain, files in sorted(domains.items()):
-            index_html += f'    <div class="domain">\n'
-            index_html += f'        <h2>🌐 {domain}</h2>\n'
-            index_html += f'        <ul>\n'
-            
             # Filter for HTML files only
             html_files = [f for f in files if f.endswith('.html')]
             if not html_files:
                 continue
 
             html_files.sort()
+
+            parts.append(f'    <div class="domain">\n')
+            parts.append(f'        <h2>🌐 {domain}</h2>\n')
+            parts.append(f'        <ul>\n')
             
             for file in html_files[:20]:  # Limit to 20 files per domain
                 # Truncate long filenames for display
@@ -573,34 +1007,131 @@ class Reconstructor:
                 if file.startswith("CACHED:"):
                     url = file.replace("CACHED:", "")
                     display_name = url if len(url) <= 80 else url[:77] + '...'
-                    index_html += f'            <li><span style="color: #888;">{display_name}</span> <span class="file-type" style="background: #eee; color: #666;" title="Content was cached (304 Not Modified) and could not be reconstructed">[CACHED]</span></li>\n'
+                    parts.append(f'            <li><span style="color: #888;">{display_name}</span> <span class="file-type" style="background: #eee; color: #666;" title="Content was cached (304 Not Modified) and could not be reconstructed">[CACHED]</span></li>\n')
                 else:
-                    index_html += f'            <li><a href="{file}" title="{file}">{display_name}</a></li>\n'
+                    parts.append(f'            <li><a href="{file}" title="{file}">{display_name}</a></li>\n')
             
             if len(html_files) > 20:
-                index_html += f'            <li><em>... and {len(html_files) - 20} more files</em></li>\n'
+                parts.append(f'            <li><em>... and {len(html_files) - 20} more files</em></li>\n')
             
-            index_html += f'        </ul>\n'
-            index_html += f'    </div>\n'
+            parts.append(f'        </ul>\n')
+            parts.append(f'    </div>\n')
         
-        index_html = index_html.format(
-            total_files=html_count + resource_count,
-            html_count=html_count,
-            resource_count=resource_count
-        )
-        
-        index_html += """
+        parts.append("""
                         </body>
                         </html>
-                        """
+                        """)
+        index_html = ''.join(parts)
         
         # save index file
         index_path = self.outputdir/'index.html'
-        with open(index_path, 'w', encoding='utf-8') as f:
-            f.write(index_html)
+        index_path.write_text(index_html, encoding='utf-8')
 
         print(f"\nCreated index page: {index_path}")
 
+    @staticmethod
+    def summarise_urls(flows) -> Tuple[Dict[str, str], set]:
+        """
+        single pass over flows: first-seen MIME type per URL, plus the URLs
+        that have a response body (reconstructible)
+
+        args:
+        flows(iterable) - flow dictionaries, e.g. self.data or a streaming parser
+
+        returns:
+        (mime_by_url, reconstructible_urls) - dict of url -> mime type, set of urls
+        """
+        mime_by_url = {}
+        reconstructible_urls = set()
+        for i in flows:
+            url = i.get('url')
+            if not url:
+                continue
+            mime_by_url.setdefault(url, i.get('mime_type', ''))
+            if i.get('resp_body_b64'):
+                reconstructible_urls.add(url)
+
+        return mime_by_url, reconstructible_urls
+
+    def build_url_listing(self, mime_by_url: Dict[str, str], reconstructible_urls: set,
+                          path_for=None) -> List[Dict]:
+        """
+        list captured URLs with their local file and whether it was reconstructed;
+        reconstructible URLs first, then alphabetical
+
+        args:
+        mime_by_url(dict) - url -> mime type, from summarise_urls
+        reconstructible_urls(set) - urls with a response body, from summarise_urls
+        path_for(callable) - optional (url, mime_type) -> Path, defaults to create_local_path
+
+        returns:
+        listing(list) - dicts with original, path (relative to outputdir), mime_type, reconstructed
+        """
+        path_for = path_for or self.create_local_path
+
+        # one walk of the output tree instead of a stat() per URL
+        existing_files = {
+            Path(root) / name
+            for root, _, files in os.walk(self.outputdir)
+            for name in files
+        }
+
+        listing = []
+        for url in sorted(mime_by_url, key=lambda u: (u not in reconstructible_urls, u)):
+            mime_type = mime_by_url[url]
+            localpath = path_for(url, mime_type)
+
+            try:
+                rel_path = str(localpath.relative_to(self.outputdir)).replace('\\', '/')
+            except ValueError:
+                rel_path = ''
+
+            listing.append({
+                'original': url,
+                'path': rel_path,
+                'mime_type': mime_type,
+                'reconstructed': localpath in existing_files
+            })
+
+        return listing
+
+    def manifest_path(self, jsonfile: Optional[str] = None) -> Path:
+        """
+        location of the URL manifest for a capture file
+
+        args:
+        jsonfile(str) - capture file; defaults to this reconstructor's file
+
+        returns:
+        Path object for the manifest
+        """
+        return self.outputdir / self.MANIFEST_DIR / f"{Path(jsonfile or self.jsonfile).stem}.json"
+
+    def create_manifest(self) -> Path:
+        """
+        save the URL listing for the loaded capture, so the web interface can show it
+        without re-reading the capture; run after reconstruct()
+
+        args:
+        N/A
+
+        returns:
+        Path object for the manifest
+        """
+        listing = self.build_url_listing(*self.summarise_urls(self.data))
+
+        manifest = self.manifest_path()
+        manifest.parent.mkdir(exist_ok=True)
+
+        # write then rename, readers never see a partial file
+        tmp_path = manifest.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(listing, f)
+        os.replace(tmp_path, manifest)
+
+        print(f"Created URL manifest: {manifest}")
+        return manifest
+
 def main():
     """
     main function